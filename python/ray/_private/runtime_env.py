@@ -1,25 +1,46 @@
+import functools
 import hashlib
+import io
 import logging
 import json
-import yaml
+import mmap
+import posixpath
+import re
+import shutil
+import threading
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 
-from filelock import FileLock
 from pathlib import Path
-from zipfile import ZipFile
-from ray._private.thirdparty.pathspec import PathSpec
 from ray.job_config import JobConfig
 from enum import Enum
 
 import ray
+from ray._private.client_mode_hook import (_get_client_hook_status_on_thread,
+                                           _set_client_hook_status)
 from ray.experimental.internal_kv import (_internal_kv_put, _internal_kv_get,
                                           _internal_kv_exists,
                                           _internal_kv_initialized)
 
-from typing import List, Tuple, Optional, Callable
+from typing import Dict, List, Tuple, Optional, Callable, TYPE_CHECKING
 from urllib.parse import urlparse
 import os
 import sys
 
+if TYPE_CHECKING:
+    from zipfile import ZipFile, ZipInfo
+
+try:
+    from blake3 import blake3 as _hasher
+except ImportError:
+    _hasher = functools.partial(hashlib.blake2b, digest_size=16)
+
+# Hashers for file contents are copied from this primed one, which is
+# cheaper than initializing a new hasher for every file.
+_file_hasher = _hasher()
+_file_hasher.update(b"ray-pkg-v1\x00")
+
 # We need to setup this variable before
 # using this module
 PKG_DIR = None
@@ -28,6 +49,42 @@ logger = logging.getLogger(__name__)
 
 FILE_SIZE_WARNING = 10 * 1024 * 1024  # 10MiB
 GCS_STORAGE_MAX_SIZE = 512 * 1024 * 1024  # 512MiB
+# Packages larger than this are stored in the GCS in chunks of this size,
+# under "<uri>.part<i>" keys. The key of the uri itself then holds
+# _GCS_CHUNKED_PREFIX followed by the number of chunks.
+_GCS_CHUNK_SIZE = 16 * 1024 * 1024  # 16MiB
+_GCS_CHUNKED_PREFIX = b"_ray_pkg_chunks:"
+
+# Source and text files compress well, so they are deflated at the fastest
+# level. Everything else (wheels, shared objects, images, ...) is usually
+# compressed already and is stored as is.
+_DEFLATE_SUFFIXES = {".py", ".json", ".yaml", ".yml", ".txt", ".md"}
+# `compresslevel` was added to ZipFile.write in Python 3.7.
+_DEFLATE_OPTIONS = {"compresslevel": 1} if sys.version_info >= (3, 7) else {}
+# Stored files at least this large are copied into the zip from an mmap.
+_ZIP_MMAP_THRESHOLD = 16 * 1024 * 1024  # 16MiB
+
+# Packages are hashed and unpacked concurrently. Both are a mix of blocking
+# file IO and GIL-free digest/zlib work, so we use more threads than cores.
+_IO_MAX_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+_HASH_BUF_SIZE = 4096 * 1024
+# Digests are truncated to this many bytes, which is the length of the hash
+# in package names.
+_DIGEST_SIZE = 16
+# Per-thread read buffers for interpreters without hashlib.file_digest.
+_hash_buffers = threading.local()
+# Files walked while naming a package, keyed by package uri, so that
+# uploading the package doesn't walk the directories again.
+_package_files: Dict[str, List["_PackageEntry"]] = {}
+
+
+def _sort_dict_keys(value):
+    """Return a copy of value with the keys of all nested dicts sorted."""
+    if isinstance(value, dict):
+        return {k: _sort_dict_keys(value[k]) for k in sorted(value)}
+    if isinstance(value, list):
+        return [_sort_dict_keys(v) for v in value]
+    return value
 
 
 class RuntimeEnvDict:
@@ -105,9 +162,15 @@ class RuntimeEnvDict:
                     if not yaml_file.is_file():
                         raise ValueError(
                             f"Can't find conda YAML file {yaml_file}")
+                    # Import yaml lazily, most runtime envs don't need it.
+                    import yaml
+                    # Use the libyaml-backed loader when PyYAML was built
+                    # with it; it is an order of magnitude faster than the
+                    # pure-Python SafeLoader.
+                    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
                     try:
-                        self._dict["conda"] = yaml.safe_load(
-                            yaml_file.read_text())
+                        self._dict["conda"] = yaml.load(
+                            yaml_file.read_text(), Loader=loader)
                     except Exception as e:
                         raise ValueError(
                             f"Invalid conda file {yaml_file} with error {e}")
@@ -211,17 +274,22 @@ class RuntimeEnvDict:
         if all(val is None for val in self._dict.values()):
             self._dict = {}
 
+        # We will use the serialized dict as a key to cache workers by, so
+        # it must be independent of the order the user gave the keys in.
+        # Sort them once here rather than on every serialization.
+        self._dict = _sort_dict_keys(self._dict)
+
     def get_parsed_dict(self) -> dict:
         return self._dict
 
     def serialize(self) -> str:
-        # Use sort_keys=True because we will use the output as a key to cache
-        # workers by, so we need the serialization to be independent of the
-        # dict order.
-        return json.dumps(self._dict, sort_keys=True)
+        # The keys are already sorted, so this matches the output of
+        # json.dumps(..., sort_keys=True) used for task runtime envs.
+        return json.dumps(self._dict)
 
     def set_uris(self, uris):
         self._dict["uris"] = uris
+        self._dict = _sort_dict_keys(self._dict)
 
 
 class Protocol(Enum):
@@ -239,82 +307,185 @@ class Protocol(Enum):
     PIN_GCS = "pingcs", "For packages created and managed by the users."
 
 
-def _xor_bytes(left: bytes, right: bytes) -> bytes:
-    if left and right:
-        return bytes(a ^ b for (a, b) in zip(left, right))
-    return left or right
+class _RootEntry:
+    """A minimal ``os.DirEntry`` stand-in for the root of a traversal.
+
+    ``os.DirEntry`` objects can only be produced by ``os.scandir``, so the
+    directory a walk starts from is wrapped in this class instead.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.basename(path)
+
+    def is_dir(self, follow_symlinks: bool = True) -> bool:
+        return os.path.isdir(self.path)
+
+    def is_file(self, follow_symlinks: bool = True) -> bool:
+        return os.path.isfile(self.path)
+
+    def stat(self, follow_symlinks: bool = True) -> os.stat_result:
+        return os.stat(self.path)
+
+    def __fspath__(self) -> str:
+        return self.path
 
 
 def _dir_travel(
-        path: Path,
+        path: str,
         excludes: List[Callable],
         handler: Callable,
 ):
-    e = _get_gitignore(path)
-    if e is not None:
-        excludes.append(e)
-    skip = any(e(path) for e in excludes)
-    if not skip:
+    """Walk the directory tree rooted at path.
+
+    The handler is called with an ``os.DirEntry`` for every entry that is
+    not excluded, starting with the root itself. Excluded directories are
+    not descended into. The walk uses an explicit stack and ``os.scandir``,
+    so file types come straight from the directory listing.
+    """
+    stack = [(_RootEntry(os.path.abspath(path)), excludes)]
+    while stack:
+        entry, excludes = stack.pop()
+        if any(e(entry) for e in excludes):
+            continue
         try:
-            handler(path)
+            handler(entry)
         except Exception as e:
-            logger.error(f"Issue with path: {path}")
+            logger.error(f"Issue with path: {entry.path}")
             raise e
-        if path.is_dir():
-            for sub_path in path.iterdir():
-                _dir_travel(sub_path, excludes, handler)
-    if e is not None:
-        excludes.pop()
+        if entry.is_dir():
+            with os.scandir(entry.path) as it:
+                sub_entries = list(it)
+            # A directory's own .gitignore never matches the directory
+            # itself, so it only needs to apply to its children.
+            e = _get_gitignore(entry.path, sub_entries)
+            if e is not None:
+                excludes = excludes + [e]
+            stack.extend((sub_entry, excludes) for sub_entry in sub_entries)
 
 
-def _zip_module(root: Path, relative_path: Path, excludes: Optional[Callable],
-                zip_handler: ZipFile) -> None:
-    """Go through all files and zip them into a zip file"""
+# An entry of a package, as listed by _walk_files. stat is the result of
+# os.stat for the entry. is_empty is only set for directories without any
+# entries, which are the only directories written to the zip.
+_PackageEntry = namedtuple(
+    "_PackageEntry", ["path", "relative_path", "is_dir", "stat", "is_empty"])
 
-    def handler(path: Path):
-        # Pack this path if it's an empty directory or it's a file.
-        if path.is_dir() and next(path.iterdir(),
-                                  None) is None or path.is_file():
-            file_size = path.stat().st_size
-            if file_size >= FILE_SIZE_WARNING:
-                logger.warning(
-                    f"File {path} is very large ({file_size} bytes). "
-                    "Consider excluding this file from the working directory.")
-            to_path = path.relative_to(relative_path)
-            zip_handler.write(path, to_path)
+
+def _walk_files(root: str, relative_path: str,
+                excludes: Optional[Callable]) -> List[_PackageEntry]:
+    """List the entries of a directory that go into a package.
+
+    Returns:
+        A _PackageEntry for root and every entry under it that isn't
+        excluded, with paths relative to relative_path.
+    """
+    entries = []
+
+    def handler(entry: os.DirEntry):
+        entries.append(
+            _PackageEntry(entry.path, os.path.relpath(entry.path,
+                                                      relative_path),
+                          entry.is_dir(), entry.stat(), False))
 
     excludes = [] if excludes is None else [excludes]
     _dir_travel(root, excludes, handler)
+    # Only directories none of whose entries were walked can be empty. The
+    # others don't need to be listed again.
+    parents = {os.path.dirname(e.path) for e in entries}
+    return [
+        e._replace(is_empty=True)
+        if e.is_dir and e.path not in parents and not os.listdir(e.path) else e
+        for e in entries
+    ]
 
 
-def _hash_modules(
-        root: Path,
-        relative_path: Path,
-        excludes: Optional[Callable],
-) -> bytes:
-    """Helper function to create hash of a directory.
+def _zip_files(files: List[_PackageEntry], zip_handler: "ZipFile") -> None:
+    """Zip the entries listed by _walk_files into a zip file.
 
-    It'll go through all the files in the directory and xor
-    hash(file_name, file_content) to create a hash value.
+    Entries removed since they were listed are left out.
     """
-    hash_val = None
-    BUF_SIZE = 4096 * 1024
-
-    def handler(path: Path):
-        md5 = hashlib.md5()
-        md5.update(str(path.relative_to(relative_path)).encode())
-        if not path.is_dir():
-            with path.open("rb") as f:
-                data = f.read(BUF_SIZE)
-                while len(data) != 0:
-                    md5.update(data)
-                    data = f.read(BUF_SIZE)
-        nonlocal hash_val
-        hash_val = _xor_bytes(hash_val, md5.digest())
+    from zipfile import ZipInfo, ZIP_DEFLATED
 
-    excludes = [] if excludes is None else [excludes]
-    _dir_travel(root, excludes, handler)
-    return hash_val
+    for path, to_path, is_dir, st, is_empty in files:
+        # Pack this path if it's an empty directory or it's a file.
+        if is_dir and not is_empty:
+            continue
+        file_size = st.st_size
+        if file_size >= FILE_SIZE_WARNING:
+            logger.warning(
+                f"File {path} is very large ({file_size} bytes). "
+                "Consider excluding this file from the working directory.")
+        try:
+            if not is_dir and os.path.splitext(path)[1] in _DEFLATE_SUFFIXES:
+                zip_handler.write(
+                    path,
+                    to_path,
+                    compress_type=ZIP_DEFLATED,
+                    **_DEFLATE_OPTIONS)
+            elif not is_dir and file_size >= _ZIP_MMAP_THRESHOLD:
+                # Hand the whole mapping to the zip writer in one call
+                # instead of copying it through small read buffers.
+                zip_info = ZipInfo.from_file(path, to_path)
+                with open(path, "rb") as f, mmap.mmap(
+                        f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    with zip_handler.open(zip_info, "w") as dest:
+                        dest.write(mm)
+            else:
+                zip_handler.write(path, to_path)
+        except FileNotFoundError:
+            logger.warning(f"{path} was removed while packaging it.")
+
+
+def _hash_one(path: str) -> bytes:
+    """Return the digest of the content of a single file.
+
+    BLAKE3 is used when the blake3 package is installed, otherwise
+    BLAKE2b. Both are considerably faster than md5.
+    """
+    h = _file_hasher.copy()
+    # We read in large chunks ourselves, so skip the extra copy through a
+    # BufferedReader.
+    with open(path, "rb", buffering=0) as f:
+        if hasattr(hashlib, "file_digest"):
+            hashlib.file_digest(f, lambda: h)
+        else:
+            buf = getattr(_hash_buffers, "buf", None)
+            if buf is None:
+                buf = _hash_buffers.buf = bytearray(_HASH_BUF_SIZE)
+            mv = memoryview(buf)
+            n = f.readinto(buf)
+            while n:
+                h.update(mv[:n])
+                n = f.readinto(buf)
+    return h.digest()[:_DIGEST_SIZE]
+
+
+def _hash_files(entries: List[_PackageEntry]) -> bytes:
+    """Create a hash of the entries of a package.
+
+    The contents of the files are hashed in parallel. Their digests are
+    then fed, sorted by relative path and prefixed with that path, into a
+    single hash. Unlike combining the per-file digests with xor, this
+    can't be cancelled out by pairs of identical entries.
+
+    Args:
+        entries: The entries of the package, as returned by _walk_files.
+    """
+    entries = sorted(entries, key=lambda e: e.relative_path)
+    with ThreadPoolExecutor(max_workers=_IO_MAX_WORKERS) as executor:
+        digests = executor.map(_hash_one,
+                               [e.path for e in entries if not e.is_dir])
+    h = _hasher()
+    for entry in entries:
+        relative_path = entry.relative_path.encode()
+        h.update(len(relative_path).to_bytes(4, "little"))
+        h.update(relative_path)
+        if entry.is_dir:
+            h.update(b"d")
+        else:
+            h.update(b"f")
+            h.update(next(digests))
+    return h.digest()[:_DIGEST_SIZE]
 
 
 def _get_local_path(pkg_uri: str) -> str:
@@ -323,40 +494,132 @@ def _get_local_path(pkg_uri: str) -> str:
     return os.path.join(PKG_DIR, pkg_name)
 
 
+@functools.lru_cache(maxsize=1024)
 def _parse_uri(pkg_uri: str) -> Tuple[Protocol, str]:
     uri = urlparse(pkg_uri)
     protocol = Protocol(uri.scheme)
     return (protocol, uri.netloc)
 
 
-def _get_excludes(path: Path, excludes: List[str]) -> Callable:
-    path = path.absolute()
-    pathspec = PathSpec.from_lines("gitwildmatch", excludes)
+def _compile_pathspec(lines: List[str]) -> Callable[[str], bool]:
+    """Compile gitwildmatch lines into a function matching path strings.
+
+    PathSpec.match_file tries every pattern in turn. Without negated ("!")
+    patterns only whether any pattern matches matters, so in that case the
+    patterns are joined into a single regex instead.
+    """
+    from ray._private.thirdparty.pathspec import PathSpec
+    from ray._private.thirdparty.pathspec.util import normalize_file
+
+    pathspec = PathSpec.from_lines("gitwildmatch", lines)
+    patterns = [p for p in pathspec.patterns if p.include is not None]
+    if not all(p.include for p in patterns):
+        return pathspec.match_file
+    if not patterns:
+        return lambda path_str: False
+    regex = re.compile("|".join(f"(?:{p.regex.pattern})" for p in patterns))
+    return lambda path_str: regex.match(normalize_file(path_str)) is not None
 
-    def match(p: Path):
-        path_str = str(p.absolute().relative_to(path))
+
+def _get_excludes(path: str, excludes: List[str]) -> Callable:
+    path = os.path.abspath(path)
+    match_file = _compile_pathspec(excludes)
+
+    def match(p: os.DirEntry):
+        path_str = os.path.relpath(p.path, path)
         path_str += "/"
-        return pathspec.match_file(path_str)
+        return match_file(path_str)
 
     return match
 
 
-def _get_gitignore(path: Path) -> Optional[Callable]:
-    path = path.absolute()
-    ignore_file = path / ".gitignore"
-    if ignore_file.is_file():
-        with ignore_file.open("r") as f:
-            pathspec = PathSpec.from_lines("gitwildmatch", f.readlines())
+@functools.lru_cache(maxsize=4096)
+def _compile_gitignore(ignore_file: str,
+                       mtime_ns: int) -> Callable[[str], bool]:
+    """Parse and compile a .gitignore file.
+
+    Results are cached by path and modification time, so repeated walks of
+    the same tree don't recompile unchanged patterns.
+    """
+    with open(ignore_file, "r") as f:
+        return _compile_pathspec(f.readlines())
+
 
-        def match(p: Path):
-            path_str = str(p.absolute().relative_to(path))
-            if p.is_dir():
-                path_str += "/"
-            return pathspec.match_file(path_str)
+def _get_gitignore(path: str,
+                   entries: List[os.DirEntry]) -> Optional[Callable]:
+    """Get a matcher for the .gitignore file among a directory's entries.
 
-        return match
+    Args:
+        path (str): The absolute path of the directory.
+        entries (List[os.DirEntry]): The entries of that directory, as
+            returned by ``os.scandir``.
+
+    Returns:
+        A callable matching entries against the .gitignore, or None if the
+        directory doesn't contain one.
+    """
+    for entry in entries:
+        if entry.name == ".gitignore" and entry.is_file():
+            break
     else:
         return None
+    match_file = _compile_gitignore(entry.path, entry.stat().st_mtime_ns)
+
+    def match(p: os.DirEntry):
+        path_str = os.path.relpath(p.path, path)
+        if p.is_dir():
+            path_str += "/"
+        return match_file(path_str)
+
+    return match
+
+
+def _walk_package(working_dir: Optional[str], module_dirs: List[str],
+                  excludes: List[str]) -> List[_PackageEntry]:
+    """List the entries of working_dir and the modules in one pass.
+
+    Hashing and zipping both consume this list, so a package only has to
+    be walked once.
+    """
+    files = []
+    if working_dir:
+        files += _walk_files(working_dir, working_dir,
+                             _get_excludes(working_dir, excludes))
+    for module_dir in module_dirs:
+        files += _walk_files(module_dir, os.path.dirname(module_dir), None)
+    return files
+
+
+def _get_package_fingerprint(files: List[_PackageEntry]) -> str:
+    """Fingerprint the files of a package using only their metadata.
+
+    The files aren't read, only the stat results from the walk are used.
+    The path in the package, local path, inode, size, modification and
+    change time of every file and directory are combined, so adding,
+    removing, moving or editing a file changes the fingerprint. The change
+    time covers edits that restore the modification time, as ``cp -p`` or
+    ``rsync -a`` do.
+    """
+    stats = []
+    for path, rel_path, is_dir, st, _ in files:
+        stats.append(f"{rel_path}\0{path}\0{is_dir:d}\0{st.st_ino}"
+                     f"\0{st.st_size}\0{st.st_mtime_ns}\0{st.st_ctime_ns}")
+    h = _hasher()
+    h.update(b"ray-pkg-fingerprint-v1\x00")
+    h.update("\n".join(sorted(stats)).encode())
+    return h.digest()[:_DIGEST_SIZE].hex()
+
+
+def _get_package_name_cache_file(working_dir: Optional[str],
+                                 module_dirs: List[str]) -> Path:
+    """Get the file caching the package name of these directories.
+
+    There's one file per set of directories, which is overwritten whenever
+    their files change, so the cache doesn't grow with every edit.
+    """
+    h = _hasher()
+    h.update(json.dumps([working_dir, module_dirs]).encode())
+    return Path(PKG_DIR) / f"_ray_pkg_name_{h.digest()[:_DIGEST_SIZE].hex()}"
 
 
 # TODO(yic): Fix this later to handle big directories in better way
@@ -387,29 +650,65 @@ def get_project_package_name(working_dir: str, py_modules: List[str],
     Returns:
         Package name as a string.
     """
+    return _get_project_package_name_and_files(working_dir, py_modules,
+                                               excludes)[0]
+
+
+def _get_project_package_name_and_files(
+        working_dir: str, py_modules: List[str],
+        excludes: List[str]) -> Tuple[Optional[str], List[_PackageEntry]]:
+    """Same as get_project_package_name, but also return the walked files.
+
+    The files can be passed to _create_package_from_files so that creating
+    the package doesn't walk the directories again.
+    """
     RAY_PKG_PREFIX = "_ray_pkg_"
-    hash_val = None
     if working_dir:
         if not isinstance(working_dir, str):
             raise TypeError("`working_dir` must be a string.")
-        working_dir = Path(working_dir).absolute()
-        if not working_dir.exists() or not working_dir.is_dir():
+        working_dir = os.path.abspath(working_dir)
+        if not os.path.isdir(working_dir):
             raise ValueError(f"working_dir {working_dir} must be an existing"
                              " directory")
-        hash_val = _xor_bytes(
-            hash_val,
-            _hash_modules(working_dir, working_dir,
-                          _get_excludes(working_dir, excludes)))
+    module_dirs = []
     for py_module in py_modules or []:
         if not isinstance(py_module, str):
             raise TypeError("`py_module` must be a string.")
-        module_dir = Path(py_module).absolute()
-        if not module_dir.exists() or not module_dir.is_dir():
+        module_dir = os.path.abspath(py_module)
+        if not os.path.isdir(module_dir):
             raise ValueError(f"py_module {py_module} must be an existing"
                              " directory")
-        hash_val = _xor_bytes(
-            hash_val, _hash_modules(module_dir, module_dir.parent, None))
-    return RAY_PKG_PREFIX + hash_val.hex() + ".zip" if hash_val else None
+        module_dirs.append(module_dir)
+
+    files = _walk_package(working_dir, module_dirs, excludes)
+    if not files:
+        return None, files
+
+    # Hashing reads every file, so first check whether the name has already
+    # been computed for files with exactly the same metadata.
+    cache_file = None
+    if PKG_DIR:
+        fingerprint = _get_package_fingerprint(files)
+        cache_file = _get_package_name_cache_file(working_dir, module_dirs)
+        try:
+            cached_fingerprint, pkg_name = cache_file.read_text().split()
+        except (OSError, ValueError):
+            pass
+        else:
+            if cached_fingerprint == fingerprint:
+                return pkg_name, files
+
+    pkg_name = RAY_PKG_PREFIX + _hash_files(files).hex() + ".zip"
+    if cache_file is not None:
+        # Write atomically since concurrent drivers may share PKG_DIR. The
+        # cache is only an optimization, so failing to write it is fine.
+        tmp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}")
+        try:
+            tmp_file.write_text(f"{fingerprint} {pkg_name}")
+            os.replace(tmp_file, cache_file)
+        except OSError as e:
+            logger.debug(f"Failed to cache package name {pkg_name}: {e}")
+    return pkg_name, files
 
 
 def create_project_package(working_dir: str, py_modules: List[str],
@@ -426,16 +725,29 @@ def create_project_package(working_dir: str, py_modules: List[str],
         excludes (List(str)): The directories or file to be excluded.
         output_path (str): The path of file to be created.
     """
-    pkg_file = Path(output_path).absolute()
-    with ZipFile(pkg_file, "w") as zip_handler:
-        if working_dir:
-            # put all files in /path/working_dir into zip
-            working_path = Path(working_dir).absolute()
-            _zip_module(working_path, working_path,
-                        _get_excludes(working_path, excludes), zip_handler)
-        for py_module in py_modules or []:
-            module_path = Path(py_module).absolute()
-            _zip_module(module_path, module_path.parent, None, zip_handler)
+    working_dir = os.path.abspath(working_dir) if working_dir else None
+    module_dirs = [os.path.abspath(m) for m in py_modules or []]
+    _create_package_from_files(
+        _walk_package(working_dir, module_dirs, excludes), output_path)
+
+
+def _create_package_from_files(files: List[_PackageEntry],
+                               output_path: str) -> None:
+    """Create a package from the entries listed by _walk_files."""
+    from zipfile import ZipFile
+
+    with ZipFile(os.path.abspath(output_path), "w") as zip_handler:
+        _zip_files(files, zip_handler)
+
+
+def _extract_members(code: bytes, members: List["ZipInfo"], path: str) -> None:
+    from zipfile import ZipFile
+
+    # Each thread reads through its own ZipFile, since a ZipFile serializes
+    # reads of its members.
+    with ZipFile(io.BytesIO(code), "r") as zip_ref:
+        for member in members:
+            zip_ref.extract(member, path)
 
 
 def fetch_package(pkg_uri: str) -> int:
@@ -458,21 +770,90 @@ def fetch_package(pkg_uri: str) -> int:
     logger.debug("Fetch packge")
     (protocol, pkg_name) = _parse_uri(pkg_uri)
     if protocol in (Protocol.GCS, Protocol.PIN_GCS):
-        code = _internal_kv_get(pkg_uri)
-        if code is None:
-            raise IOError("Fetch uri failed")
-        code = code or b""
-        pkg_file.write_bytes(code)
+        code = _fetch_package_from_gcs(pkg_uri)
     else:
         raise NotImplementedError(f"Protocol {protocol} is not supported")
 
-    logger.debug(f"Unpack {pkg_file} to {local_dir}")
-    with ZipFile(str(pkg_file), "r") as zip_ref:
-        zip_ref.extractall(local_dir)
-    pkg_file.unlink()
+    from zipfile import ZipFile, ZipInfo
+
+    # The package is already in memory, so unpack it from there instead of
+    # writing it to disk and reading it back. It's unpacked next to
+    # local_dir and only moved into place once complete, so an existing
+    # local_dir always holds the full package.
+    logger.debug(f"Unpack {pkg_uri} to {local_dir}")
+    unpack_dir = local_dir.with_name(local_dir.name + ".unpack")
+    if unpack_dir.exists():
+        # Left over from an interrupted unpack.
+        shutil.rmtree(unpack_dir)
+    unpack_dir.mkdir(parents=True)
+    with ZipFile(io.BytesIO(code), "r") as zip_ref:
+        # Create all directories up front so that the parallel extraction
+        # below doesn't race on creating them. Going through extract()
+        # sanitizes the paths the same way as for the files.
+        members = []
+        dirs = set()
+        for member in zip_ref.infolist():
+            if member.is_dir():
+                dirs.add(member.filename)
+            else:
+                members.append(member)
+                parent = posixpath.dirname(member.filename)
+                if parent:
+                    dirs.add(parent + "/")
+        for d in sorted(dirs):
+            zip_ref.extract(ZipInfo(d), str(unpack_dir))
+    num_workers = min(_IO_MAX_WORKERS, len(members))
+    if num_workers > 0:
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            futures = [
+                executor.submit(_extract_members, code,
+                                members[i::num_workers], str(unpack_dir))
+                for i in range(num_workers)
+            ]
+            for future in futures:
+                future.result()
+    os.replace(unpack_dir, local_dir)
+    # On the driver's node this is the package created for the upload. It
+    # isn't needed once unpacked, and only local_dir gets cleaned up.
+    try:
+        pkg_file.unlink()
+    except FileNotFoundError:
+        pass
     return local_dir
 
 
+def _map_internal_kv(func: Callable, *iterables) -> list:
+    """Run internal KV calls concurrently on a thread pool.
+
+    Whether the client mode hook applies is a thread-local setting, so it's
+    carried over from the calling thread.
+    """
+    hook_status = _get_client_hook_status_on_thread()
+
+    def call(*args):
+        _set_client_hook_status(hook_status)
+        return func(*args)
+
+    with ThreadPoolExecutor(max_workers=_IO_MAX_WORKERS) as executor:
+        return list(executor.map(call, *iterables))
+
+
+def _fetch_package_from_gcs(gcs_key: str) -> bytes:
+    code = _internal_kv_get(gcs_key)
+    if code is None:
+        raise IOError("Fetch uri failed")
+    code = code or b""
+    if code.startswith(_GCS_CHUNKED_PREFIX):
+        num_chunks = int(code[len(_GCS_CHUNKED_PREFIX):])
+        chunks = _map_internal_kv(
+            _internal_kv_get,
+            [f"{gcs_key}.part{i}" for i in range(num_chunks)])
+        if any(chunk is None for chunk in chunks):
+            raise IOError("Fetch uri failed")
+        code = b"".join(chunks)
+    return code
+
+
 def _store_package_in_gcs(gcs_key: str, data: bytes) -> int:
     if len(data) >= GCS_STORAGE_MAX_SIZE:
         raise RuntimeError(
@@ -480,7 +861,22 @@ def _store_package_in_gcs(gcs_key: str, data: bytes) -> int:
             "can exclude large files using the 'excludes' option to the "
             "runtime_env.")
 
-    _internal_kv_put(gcs_key, data)
+    if len(data) <= _GCS_CHUNK_SIZE:
+        _internal_kv_put(gcs_key, data)
+        return len(data)
+
+    # Upload large packages in chunks concurrently rather than in a single
+    # blocking call. The GCS deletes the chunks along with the package.
+    chunks = [
+        data[i:i + _GCS_CHUNK_SIZE]
+        for i in range(0, len(data), _GCS_CHUNK_SIZE)
+    ]
+    _map_internal_kv(_internal_kv_put,
+                     [f"{gcs_key}.part{i}" for i in range(len(chunks))],
+                     chunks)
+    # Write the package key last, so the package only exists once all of
+    # its chunks have been stored.
+    _internal_kv_put(gcs_key, _GCS_CHUNKED_PREFIX + str(len(chunks)).encode())
     return len(data)
 
 
@@ -542,9 +938,13 @@ def rewrite_runtime_env_uris(job_config: JobConfig) -> None:
     if working_dir or py_modules:
         if excludes is None:
             excludes = []
-        pkg_name = get_project_package_name(working_dir, py_modules, excludes)
-        job_config.set_runtime_env_uris(
-            [Protocol.GCS.value + "://" + pkg_name])
+        pkg_name, files = _get_project_package_name_and_files(
+            working_dir, py_modules, excludes)
+        pkg_uri = Protocol.GCS.value + "://" + pkg_name
+        # Keep the walked files so the package can be created without
+        # walking the directories again.
+        _package_files[pkg_uri] = files
+        job_config.set_runtime_env_uris([pkg_uri])
 
 
 def upload_runtime_env_package_if_needed(job_config: JobConfig) -> None:
@@ -561,6 +961,7 @@ def upload_runtime_env_package_if_needed(job_config: JobConfig) -> None:
     assert _internal_kv_initialized()
     pkg_uris = job_config.get_runtime_env_uris()
     for pkg_uri in pkg_uris:
+        files = _package_files.pop(pkg_uri, None)
         if not package_exists(pkg_uri):
             file_path = _get_local_path(pkg_uri)
             pkg_file = Path(file_path)
@@ -570,13 +971,29 @@ def upload_runtime_env_package_if_needed(job_config: JobConfig) -> None:
             logger.info(f"{pkg_uri} doesn't exist. Create new package with"
                         f" {working_dir} and {py_modules}")
             if not pkg_file.exists():
-                create_project_package(working_dir, py_modules, excludes,
-                                       file_path)
+                if files is not None:
+                    _create_package_from_files(files, file_path)
+                else:
+                    create_project_package(working_dir, py_modules, excludes,
+                                           file_path)
             # Push the data to remote storage
             pkg_size = push_package(pkg_uri, pkg_file)
             logger.info(f"{pkg_uri} has been pushed with {pkg_size} bytes")
 
 
+def clear_runtime_env_package_files(job_config: JobConfig) -> None:
+    """Drop the files kept by rewrite_runtime_env_uris for a job.
+
+    upload_runtime_env_package_if_needed drops them as it goes, so this only
+    matters if the job failed to start before its packages were uploaded.
+
+    Args:
+        job_config (JobConfig): The job config of driver.
+    """
+    for pkg_uri in job_config.get_runtime_env_uris():
+        _package_files.pop(pkg_uri, None)
+
+
 def ensure_runtime_env_setup(pkg_uris: List[str]) -> Optional[str]:
     """Make sure all required packages are downloaded it local.
 
@@ -590,14 +1007,30 @@ def ensure_runtime_env_setup(pkg_uris: List[str]) -> Optional[str]:
         Working directory is returned if the pkg_uris is not empty,
         otherwise, None is returned.
     """
+    from filelock import FileLock
+
     pkg_dir = None
     assert _internal_kv_initialized()
     for pkg_uri in pkg_uris:
-        # For each node, the package will only be downloaded one time
-        # Locking to avoid multiple process download concurrently
         pkg_file = Path(_get_local_path(pkg_uri))
-        with FileLock(str(pkg_file) + ".lock"):
-            pkg_dir = fetch_package(pkg_uri)
+        local_dir = pkg_file.with_suffix("")
+        # fetch_package only creates the directory once the package is fully
+        # unpacked, so there's no need to take the lock if it exists.
+        if local_dir.is_dir():
+            pkg_dir = local_dir
+        else:
+            # For each node, the package will only be downloaded one time
+            # Locking to avoid multiple process download concurrently
+            lock_path = str(pkg_file) + ".lock"
+            with FileLock(lock_path):
+                pkg_dir = fetch_package(pkg_uri)
+            # Later callers take the fast path above, so the lock file is no
+            # longer needed. Processes still waiting on it find the package
+            # in place once they acquire it.
+            try:
+                os.unlink(lock_path)
+            except OSError:
+                pass
         sys.path.insert(0, str(pkg_dir))
     # Right now, multiple pkg_uris are not supported correctly.
     # We return the last one as working directory
@@ -118,6 +118,14 @@ from test_module.test import one
         os.chdir(old_dir)
 
 
+def list_packages(pkg_dir):
+    """List the entries of PKG_DIR, leaving out cached package names."""
+    return [
+        p for p in Path(pkg_dir).iterdir()
+        if not p.name.startswith("_ray_pkg_name_")
+    ]
+
+
 def start_client_server(cluster, client_mode):
     from ray._private.runtime_env import PKG_DIR
     if not client_mode:
@@ -178,18 +186,223 @@ def test_travel():
         visited_dir_paths = set()
         visited_file_paths = set()
 
-        def handler(path):
-            if path.is_dir():
-                visited_dir_paths.add(str(path))
+        def handler(entry):
+            if entry.is_dir():
+                visited_dir_paths.add(entry.path)
             else:
-                with open(path) as f:
-                    visited_file_paths.add((str(path), f.read()))
+                with open(entry.path) as f:
+                    visited_file_paths.add((entry.path, f.read()))
 
         ray._private.runtime_env._dir_travel(root, [exclude_spec], handler)
         assert file_paths == visited_file_paths
         assert dir_paths == visited_dir_paths
 
 
+@pytest.mark.parametrize("lines", [
+    [],
+    ["# comment", ""],
+    ["*.log"],
+    ["/build"],
+    ["build/"],
+    ["/docs/*.md"],
+    ["**/cache"],
+    ["logs/**"],
+    ["a/**/b"],
+    ["data/*.csv", "!data/keep.csv"],
+    ["*.py", "!test_*.py", "test_skip.py"],
+    ["sub/", "!sub/b.txt"],
+    ["\\#literal", "foo?.txt", "[ab].py"],
+])
+def test_compile_pathspec(lines):
+    from ray._private.runtime_env import _compile_pathspec
+    from ray._private.thirdparty.pathspec import PathSpec
+    paths = [
+        "a.py", "test_a.py", "test_skip.py", "x.log", "sub/x.log", "build/",
+        "build/out.o", "src/build/", "src/build", "docs/a.md", "docs/x/a.md",
+        "src/docs/a.md", "cache/", "src/cache/", "src/cache/x", "logs/",
+        "logs/x/y.txt", "a/b", "a/x/y/b", "a/b/", "data/x.csv",
+        "data/keep.csv", "sub/", "sub/b.txt", "sub/c.txt", "#literal",
+        "foo1.txt", "foo12.txt", "b.py", "c.py"
+    ]
+    match_file = _compile_pathspec(lines)
+    pathspec = PathSpec.from_lines("gitwildmatch", lines)
+    for path in paths:
+        assert match_file(path) == pathspec.match_file(path), path
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Fail to create temp dir.")
+def test_package_name_cache(monkeypatch):
+    import ray._private.runtime_env as runtime_env
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pkg_dir = Path(tmp_dir) / "pkgs"
+        pkg_dir.mkdir()
+        monkeypatch.setattr(runtime_env, "PKG_DIR", str(pkg_dir))
+        working_dir = Path(tmp_dir) / "working_dir"
+        create_file(working_dir / "a.py")
+        create_file(working_dir / "sub" / "b.py")
+
+        name = runtime_env.get_project_package_name(str(working_dir), [], [])
+        assert len(list(pkg_dir.iterdir())) == 1
+        assert runtime_env.get_project_package_name(str(working_dir), [],
+                                                    []) == name
+
+        # Changing a file's content invalidates the cached name.
+        with (working_dir / "a.py").open("w") as f:
+            f.write("Changed")
+        new_name = runtime_env.get_project_package_name(
+            str(working_dir), [], [])
+        assert new_name != name
+
+        # So does a same-size edit that restores the modification time.
+        st = (working_dir / "a.py").stat()
+        time.sleep(0.01)
+        with (working_dir / "a.py").open("w") as f:
+            f.write("Edited!")
+        os.utime(working_dir / "a.py", ns=(st.st_atime_ns, st.st_mtime_ns))
+        newer_name = runtime_env.get_project_package_name(
+            str(working_dir), [], [])
+        assert newer_name != new_name
+        new_name = newer_name
+        # The cached name is replaced rather than added to.
+        assert len(list(pkg_dir.iterdir())) == 1
+        monkeypatch.setattr(runtime_env, "PKG_DIR", None)
+        assert runtime_env.get_project_package_name(str(working_dir), [],
+                                                    []) == new_name
+        # Failing to write the cache doesn't fail naming the package.
+        monkeypatch.setattr(runtime_env, "PKG_DIR", str(pkg_dir / "missing"))
+        assert runtime_env.get_project_package_name(str(working_dir), [],
+                                                    []) == new_name
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Fail to create temp dir.")
+def test_package_name_cache_layout(monkeypatch):
+    import ray._private.runtime_env as runtime_env
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pkg_dir = Path(tmp_dir) / "pkgs"
+        pkg_dir.mkdir()
+        working_dir = Path(tmp_dir) / "working_dir"
+        (working_dir / "m").mkdir(parents=True)
+        create_file(working_dir / "m" / "f.py")
+
+        # The same directory as working_dir and as a module is packaged with
+        # different paths, so it must not share a cached name.
+        names = [
+            runtime_env.get_project_package_name(str(working_dir), [], []),
+            runtime_env.get_project_package_name(None, [str(working_dir)], [])
+        ]
+        assert names[0] != names[1]
+        monkeypatch.setattr(runtime_env, "PKG_DIR", str(pkg_dir))
+        assert runtime_env.get_project_package_name(str(working_dir), [],
+                                                    []) == names[0]
+        assert runtime_env.get_project_package_name(None, [str(working_dir)],
+                                                    []) == names[1]
+        assert runtime_env.get_project_package_name(str(working_dir), [],
+                                                    []) == names[0]
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Fail to create temp dir.")
+def test_package_name_nested_module():
+    import ray._private.runtime_env as runtime_env
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        working_dir = Path(tmp_dir) / "working_dir"
+        (working_dir / "m").mkdir(parents=True)
+        create_file(working_dir / "m" / "f.py")
+        module_dir = str(working_dir / "m")
+
+        # The module's files are in the package twice, which mustn't cancel
+        # them out of the name.
+        name = runtime_env.get_project_package_name(
+            str(working_dir), [module_dir], [])
+        with (working_dir / "m" / "f.py").open("w") as f:
+            f.write("Changed")
+        assert runtime_env.get_project_package_name(
+            str(working_dir), [module_dir], []) != name
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Fail to create temp dir.")
+def test_create_package_from_files():
+    import zipfile
+    import ray._private.runtime_env as runtime_env
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        working_dir = Path(tmp_dir) / "working_dir"
+        create_file(working_dir / "a.py")
+        create_file(working_dir / "b.py")
+        (working_dir / "empty").mkdir()
+        create_file(working_dir / "excluded" / "c.py")
+        files = runtime_env._walk_files(
+            str(working_dir), str(working_dir),
+            runtime_env._get_excludes(str(working_dir), ["excluded/c.py"]))
+
+        # Files removed after the walk are left out of the package.
+        (working_dir / "b.py").unlink()
+        pkg_file = Path(tmp_dir) / "pkg.zip"
+        runtime_env._create_package_from_files(files, str(pkg_file))
+        with zipfile.ZipFile(pkg_file) as zip_ref:
+            assert sorted(zip_ref.namelist()) == ["a.py", "empty/"]
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Fail to create temp dir.")
+def test_ensure_runtime_env_setup(monkeypatch):
+    import filelock
+    import ray._private.runtime_env as runtime_env
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pkg_dir = Path(tmp_dir) / "pkgs"
+        pkg_dir.mkdir()
+        working_dir = Path(tmp_dir) / "working_dir"
+        create_file(working_dir / "a.py")
+        pkg_file = Path(tmp_dir) / "pkg.zip"
+        runtime_env.create_project_package(
+            str(working_dir), [], [], str(pkg_file))
+        monkeypatch.setattr(runtime_env, "PKG_DIR", str(pkg_dir))
+        monkeypatch.setattr(runtime_env, "_internal_kv_initialized",
+                            lambda: True)
+        monkeypatch.setattr(runtime_env, "_fetch_package_from_gcs",
+                            lambda pkg_uri: pkg_file.read_bytes())
+        monkeypatch.setattr(sys, "path", list(sys.path))
+        pkg_uri = "gcs://_ray_pkg_test.zip"
+
+        # An interrupted unpack is discarded, and the package is only moved
+        # into place once fully unpacked.
+        create_file(pkg_dir / "_ray_pkg_test.unpack" / "stale.py")
+        local_dir = runtime_env.ensure_runtime_env_setup([pkg_uri])
+        assert local_dir == str(pkg_dir / "_ray_pkg_test")
+        assert os.listdir(local_dir) == ["a.py"]
+        # Neither the unpack dir nor the lock file are left behind.
+        assert os.listdir(pkg_dir) == ["_ray_pkg_test"]
+
+        # An unpacked package is used without taking the lock.
+        def fail(*args, **kwargs):
+            raise AssertionError("The package should already be set up.")
+
+        monkeypatch.setattr(filelock, "FileLock", fail)
+        monkeypatch.setattr(runtime_env, "fetch_package", fail)
+        assert runtime_env.ensure_runtime_env_setup([pkg_uri]) == local_dir
+        assert os.listdir(pkg_dir) == ["_ray_pkg_test"]
+
+
+# Packages up to the 16MiB chunk size are stored under a single key.
+@pytest.mark.parametrize("size,num_chunks",
+                         [(1, 0), (16 * 1024 * 1024, 0),
+                          (16 * 1024 * 1024 + 1, 2), (48 * 1024 * 1024, 3)])
+def test_package_gcs_chunks(monkeypatch, size, num_chunks):
+    import ray._private.runtime_env as runtime_env
+    assert runtime_env._GCS_CHUNK_SIZE == 16 * 1024 * 1024
+    kv_store = {}
+    monkeypatch.setattr(runtime_env, "_internal_kv_put", kv_store.__setitem__)
+    monkeypatch.setattr(runtime_env, "_internal_kv_get", kv_store.get)
+    pkg_uri = "gcs://_ray_pkg_test.zip"
+    data = os.urandom(size)
+
+    assert runtime_env._store_package_in_gcs(pkg_uri, data) == size
+    part_keys = sorted(k for k in kv_store if k != pkg_uri)
+    assert part_keys == [f"{pkg_uri}.part{i}" for i in range(num_chunks)]
+    assert runtime_env._fetch_package_from_gcs(pkg_uri) == data
+    if num_chunks:
+        del kv_store[part_keys[-1]]
+        with pytest.raises(IOError):
+            runtime_env._fetch_package_from_gcs(pkg_uri)
+
+
 """
 The following test cases are related with runtime env. It following these steps
   1) Creating a temporary dir with fixture working_dir
@@ -265,10 +478,36 @@ def test_single_node(ray_start_cluster_head, working_dir, client_mode):
     script = driver_script.format(**locals())
     out = run_string_as_driver(script, env)
     assert out.strip().split()[-1] == "1000"
-    assert len(list(Path(PKG_DIR).iterdir())) == 1
+    assert len(list_packages(PKG_DIR)) == 0
     assert len(kv._internal_kv_list("gcs://")) == 0
 
 
+@pytest.mark.skipif(sys.platform == "win32", reason="Fail to create temp dir.")
+@pytest.mark.parametrize("client_mode", [True, False])
+def test_single_node_chunked(ray_start_cluster_head, working_dir, client_mode):
+    cluster = ray_start_cluster_head
+    (address, env, PKG_DIR) = start_client_server(cluster, client_mode)
+    # The package is over the chunk size, so it's stored in several parts.
+    size = ray._private.runtime_env._GCS_CHUNK_SIZE * 2
+    with open(os.path.join(working_dir, "test_file"), "wb") as f:
+        f.write(os.urandom(size))
+    runtime_env = f"""{{  "working_dir": "{working_dir}" }}"""
+    # Execute the following cmd in driver with runtime_env
+    execute_statement = """
+@ray.remote
+def get_size():
+    return os.path.getsize("test_file")
+
+print(ray.get(get_size.remote()))
+"""
+    script = driver_script.format(**locals())
+    out = run_string_as_driver(script, env)
+    assert out.strip().split()[-1] == str(size)
+    # The parts are deleted along with the package.
+    wait_for_condition(lambda: len(kv._internal_kv_list("gcs://")) == 0)
+    assert len(list_packages(PKG_DIR)) == 0
+
+
 @pytest.mark.skipif(sys.platform == "win32", reason="Fail to create temp dir.")
 @pytest.mark.parametrize("client_mode", [True, False])
 def test_two_node(two_node_cluster, working_dir, client_mode):
@@ -281,7 +520,7 @@ def test_two_node(two_node_cluster, working_dir, client_mode):
     script = driver_script.format(**locals())
     out = run_string_as_driver(script, env)
     assert out.strip().split()[-1] == "1000"
-    assert len(list(Path(PKG_DIR).iterdir())) == 1
+    assert len(list_packages(PKG_DIR)) == 0
     assert len(kv._internal_kv_list("gcs://")) == 0
 
 
@@ -297,7 +536,7 @@ def test_two_node_module(two_node_cluster, working_dir, client_mode):
     script = driver_script.format(**locals())
     out = run_string_as_driver(script, env)
     assert out.strip().split()[-1] == "1000"
-    assert len(list(Path(PKG_DIR).iterdir())) == 1
+    assert len(list_packages(PKG_DIR)) == 0
 
 
 @pytest.mark.skipif(sys.platform == "win32", reason="Fail to create temp dir.")
@@ -317,7 +556,7 @@ print(sum([int(v) for v in vals]))
     script = driver_script.format(**locals())
     out = run_string_as_driver(script, env)
     assert out.strip().split()[-1] == "1000"
-    assert len(list(Path(PKG_DIR).iterdir())) == 1
+    assert len(list_packages(PKG_DIR)) == 0
     assert len(kv._internal_kv_list("gcs://")) == 0
 
 
@@ -474,7 +713,7 @@ def test_two_node_uri(two_node_cluster, working_dir, client_mode):
     script = driver_script.format(**locals())
     out = run_string_as_driver(script, env)
     assert out.strip().split()[-1] == "1000"
-    assert len(list(Path(PKG_DIR).iterdir())) == 1
+    assert len(list_packages(PKG_DIR)) == 0
     # pinned uri will not be deleted
     print(list(kv._internal_kv_list("")))
     assert len(kv._internal_kv_list("pingcs://")) == 1
@@ -494,7 +733,7 @@ print(sum(ray.get([test_actor.one.remote()] * 1000)))
     script = driver_script.format(**locals())
     out = run_string_as_driver(script, env)
     assert out.strip().split()[-1] == "1000"
-    assert len(list(Path(PKG_DIR).iterdir())) == 1
+    assert len(list_packages(PKG_DIR)) == 0
     assert len(kv._internal_kv_list("gcs://")) == 0
 
 
@@ -514,7 +753,7 @@ print(sum(ray.get([test_actor.one.remote()] * 1000)))
     assert out.strip().split()[-1] == "1000"
     # It's a detached actors, so it should still be there
     assert len(kv._internal_kv_list("gcs://")) == 1
-    assert len(list(Path(PKG_DIR).iterdir())) == 2
+    assert len(list_packages(PKG_DIR)) == 1
     pkg_dir = [f for f in Path(PKG_DIR).glob("*") if f.is_dir()][0]
     import sys
     sys.path.insert(0, str(pkg_dir))
@@ -523,7 +762,7 @@ print(sum(ray.get([test_actor.one.remote()] * 1000)))
     ray.kill(test_actor)
     from time import sleep
     sleep(5)
-    assert len(list(Path(PKG_DIR).iterdir())) == 1
+    assert len(list_packages(PKG_DIR)) == 0
     assert len(kv._internal_kv_list("gcs://")) == 0
 
 
@@ -938,15 +938,21 @@ def init(
         # later in the connect
         runtime_env_pkg.rewrite_runtime_env_uris(job_config)
 
-    connect(
-        _global_node,
-        mode=driver_mode,
-        log_to_driver=log_to_driver,
-        worker=global_worker,
-        driver_object_store_memory=_driver_object_store_memory,
-        job_id=None,
-        namespace=namespace,
-        job_config=job_config)
+    try:
+        connect(
+            _global_node,
+            mode=driver_mode,
+            log_to_driver=log_to_driver,
+            worker=global_worker,
+            driver_object_store_memory=_driver_object_store_memory,
+            job_id=None,
+            namespace=namespace,
+            job_config=job_config)
+    finally:
+        if job_config:
+            # Drop the files listed by rewrite_runtime_env_uris even if the
+            # package wasn't uploaded.
+            runtime_env_pkg.clear_runtime_env_package_files(job_config)
     if job_config and job_config.code_search_path:
         global_worker.set_load_code_from_local(True)
     else:
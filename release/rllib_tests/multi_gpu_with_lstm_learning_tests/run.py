@@ -1,22 +1,25 @@
 """Multi-GPU + LSTM learning tests for RLlib (torch and tf).
 """
 
+import fnmatch
 import json
 import os
-from pathlib import Path
 
 from ray.rllib.utils.test_utils import run_learning_tests_from_yaml
 
 if __name__ == "__main__":
     # Get path of this very script to look for yaml files.
-    abs_yaml_path = Path(__file__).parent
+    abs_yaml_path = os.path.dirname(os.path.abspath(__file__))
     print("abs_yaml_path={}".format(abs_yaml_path))
 
     # This pattern match is kind of hacky. Avoids cluster.yaml to get sucked
     # into this.
-    yaml_files = abs_yaml_path.rglob("*test*.yaml")
     yaml_files = sorted(
-        map(lambda path: str(path.absolute()), yaml_files), reverse=True)
+        (os.path.join(dir_path, file_name)
+         for dir_path, _, file_names in os.walk(abs_yaml_path)
+         for file_name in file_names
+         if fnmatch.fnmatch(file_name, "*test*.yaml")),
+        reverse=True)
 
     # Run all tests in the found yaml files.
     results = run_learning_tests_from_yaml(yaml_files)
@@ -426,7 +426,8 @@ void GcsServer::InitRuntimeEnvManager() {
             // Skip other uri
             cb(true);
           } else {
-            this->kv_manager_->InternalKVDelAsync(uri, [cb](int deleted_num) {
+            this->kv_manager_->InternalKVDelAsync(uri, [this, uri, cb](int deleted_num) {
+              DeleteRuntimeEnvPackageChunks(uri, 0);
               if (deleted_num == 0) {
                 cb(false);
               } else {
@@ -438,6 +439,16 @@ void GcsServer::InitRuntimeEnvManager() {
       });
 }
 
+void GcsServer::DeleteRuntimeEnvPackageChunks(const std::string &uri, size_t index) {
+  kv_manager_->InternalKVDelAsync(
+      uri + ".part" + std::to_string(index), [this, uri, index](int deleted_num) {
+        // Chunks are numbered consecutively, so stop at the first missing one.
+        if (deleted_num > 0) {
+          DeleteRuntimeEnvPackageChunks(uri, index + 1);
+        }
+      });
+}
+
 void GcsServer::InitGcsWorkerManager() {
   gcs_worker_manager_ =
       std::make_unique<GcsWorkerManager>(gcs_table_storage_, gcs_pub_sub_);
@@ -125,6 +125,11 @@ class GcsServer {
   // Init RuntimeENv manager
   void InitRuntimeEnvManager();
 
+  /// Delete the chunks of a runtime env package stored in the internal KV,
+  /// starting from the given index. Large packages are stored under
+  /// "<uri>.part<index>" keys in addition to the key of the uri itself.
+  void DeleteRuntimeEnvPackageChunks(const std::string &uri, size_t index);
+
   /// Initialize resource report polling.
   void InitResourceReportPolling(const GcsInitData &gcs_init_data);
 